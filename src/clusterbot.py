@@ -47,6 +47,36 @@ def addargs(parser):
         """,
         action='store_true')
 
+    parser.add_argument(
+        '--batch_size',
+        dest='batch_size',
+        help="""
+            Post queued reports as soon as this many are waiting.
+            Use 1 to post every new report. Default is 10.
+        """,
+        type=int,
+        default=10)
+
+    parser.add_argument(
+        '--batch_age',
+        dest='batch_age',
+        help="""
+            Post queued reports as soon as the oldest one is this many
+            seconds old. Default is 900.
+        """,
+        type=float,
+        default=900)
+
+    parser.add_argument(
+        '--rm_url',
+        dest='rm_url',
+        help="""
+            Base URL of the YARN ResourceManager web service, for example
+            http://master:8088. If given, YARN nodes are listed through its
+            REST API instead of `yarn node -list -all`.
+        """,
+        default=None)
+
 def grabargs(args_param=None):
     """ Parse command line arguments """
     parser = argparse.ArgumentParser(description='TBD')
@@ -59,6 +89,9 @@ if __name__ == "__main__":
     args_param = None
     args = grabargs(args_param)
 
-    cb = ClusterBot(args.webhook_url, args.services, args.test_mode)
+    cb = ClusterBot(
+        args.webhook_url, args.services, args.test_mode,
+        batch_size=args.batch_size, batch_age=args.batch_age,
+        rm_url=args.rm_url)
     cb.run_all()
     cb.send_data()
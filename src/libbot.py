@@ -14,13 +14,173 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import os
+import json
+import mmap
 import time
-import requests
-import numpy as np
+import re
+import shlex
+import shutil
+import hashlib
+import inspect
+import itertools
+import functools
+import threading
+import contextlib
+import subprocess
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+## Markers looked for in the (undecoded) logs, one alternation per service so
+## that each line is classified in a single scan. Group 1 and 2 tell which
+## one matched.
+_JVMS_RE = re.compile(rb"(unavailable)|(--- )")
+_SPARK_RE = re.compile(rb"(spark://vm-75222)|(--- )")
+_HDFS_RE = re.compile(rb"(Dead)|Live datanodes\D*(\d+)")
+
+## Summary line of `fping -c`, group 1 is the number of packets received
+_FPING_RE = re.compile(rb"xmt/rcv/%loss = \d+/(\d+)/")
+
+
+def _make_session():
+    """
+    Build the HTTP session used to post reports. The connection is kept
+    alive between posts, and refused connections and error statuses
+    (including Slack rate limiting, with its Retry-After header) are
+    retried with backoff. Read errors are not retried, so that a report
+    is never posted twice.
+
+    Returns
+    ----------
+    session : requests.Session
+        Session with a retrying adapter mounted on http(s)://.
+
+    Examples
+    ----------
+    >>> retry = _make_session().get_adapter("https://").max_retries
+    >>> retry.total, retry.read
+    (3, 0)
+    """
+    ## Imported here: most runs are served from the cache and never post
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    ## A post which timed out, or whose connection dropped, may have been
+    ## delivered already: only retry refused connections and error statuses
+    options = dict(
+        total=3, read=0, backoff_factor=1.5,
+        status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+    ## POST is not retried by default
+    try:
+        retry = Retry(allowed_methods=None, **options)
+    except TypeError:
+        ## urllib3 < 1.26
+        retry = Retry(method_whitelist=False, **options)
+
+    session = requests.Session()
+    session.headers.update({'Content-Type': 'application/json'})
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=1, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = None
+
+
+def _get_session():
+    """ Return the HTTP session shared by all bots, built on first use """
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = _make_session()
+    return _SESSION
+
+
+@contextlib.contextmanager
+def _timed(bot, name):
+    """ Record the wall-clock time spent in the block in `bot._timings` """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        bot._timings[name] = time.perf_counter() - t0
+
+
+def _timed_check(service):
+    """ Decorate a check_* method to record its wall-clock time """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with _timed(self, service):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _ttl_cached(service):
+    """ Decorate a check_* method to serve its report from the cache """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            ## The report depends on the arguments (e.g. the expected count)
+            call = signature.bind(self, *args, **kwargs)
+            call.apply_defaults()
+            arguments = dict(call.arguments)
+            del arguments["self"]
+
+            cached = self._cache_get(
+                service, arguments, self.cache_ttl[service])
+            if cached is not None:
+                return cached
+            msg = method(self, *args, **kwargs)
+            self._cache_put(service, arguments, msg, self._status[service])
+            return msg
+        return wrapper
+    return decorator
+
 
 class ClusterBot():
     """ Run services to monitor a cluster """
-    def __init__(self, webhook_url, services, test=False):
+    ## Lifetime (in seconds) of the cached report of each service.
+    ## Node states change on different time scales.
+    cache_ttl = {
+        "executors": 5, "jvms": 30, "yarn": 30, "spark": 30, "hdfs": 60}
+
+    ## Where cached reports are stored, in a directory private to the user
+    ## running the bot (reports are trusted when read back). They are also
+    ## kept in memory, keyed by file, for bots polling from a single process.
+    cache_path = os.path.join(
+        os.path.expanduser("~"), ".cache", "clusterbot", "{}.json")
+    _memo = {}
+
+    ## Reports waiting to be posted (see `send_data`)
+    outbox_path = "/var/tmp/clusterbot_outbox.json"
+
+    ## Counters and timings of the last (non-test) run
+    metrics_path = "/tmp/clusterbot_metrics.json"
+
+    ## Services in report order: (name, check method)
+    _SERVICES = [
+        ("executors", "check_executors"),
+        ("jvms", "check_jvms"),
+        ("yarn", "check_yarn"),
+        ("hdfs", "check_hdfs"),
+        ("spark", "check_spark")]
+
+    ## Report line of each service when it is not monitored
+    _DISABLED = {
+        "executors": ":black_circle: Executor monitoring disabled\n",
+        "jvms": ":black_circle: JVMs monitoring disabled\n",
+        "yarn": ":black_circle: YARN monitoring disabled\n",
+        "hdfs": ":black_circle: HDFS monitoring disabled\n",
+        "spark": ":black_circle: Spark monitoring disabled\n"}
+
+    def __init__(
+            self, webhook_url, services, test=False,
+            batch_size=10, batch_age=900, rm_url=None):
         """
         ClusterBot instance. Currently checks: connection to executors, YARN,
         Spark, and HDFS. The summary is formatted at the JSON format and sent
@@ -37,11 +197,25 @@ class ClusterBot():
         test : Boolean, optional
             If True, run the bot in test mode: no commands are launched, and
             data is read from local logs.
+        batch_size : Int, optional
+            Post queued reports as soon as `batch_size` of them are waiting.
+            Default is 10. Use 1 to post every new report.
+        batch_age : Float, optional
+            Post queued reports as soon as the oldest one is `batch_age`
+            seconds old. Default is 900.
+        rm_url : String, optional
+            Base URL of the YARN ResourceManager web service, e.g.
+            http://master:8088. If set, YARN nodes are listed through its
+            REST API instead of `yarn node -list -all`. Default is None.
 
         """
         self.webhook_url = webhook_url
         self.services = services
+        self._services = frozenset(services)
         self.test = test
+        self.batch_size = batch_size
+        self.batch_age = batch_age
+        self.rm_url = rm_url
         if self.test:
             print("+-- RUNNING IN TEST MODE --+")
 
@@ -51,14 +225,224 @@ class ClusterBot():
         else:
             self.date = time.ctime()
 
+        ## Date as used in log names
+        self._safe_date = self.date.replace(" ", "_")
+
         ## Header of the message to be sent
-        self.msg = "Cluster report ({})\n--------------------\n".format(
+        self.header = "Cluster report ({})\n--------------------\n".format(
             self.date)
+        self._parts = [self.header]
+
+        ## Set by the checks as soon as one of them reports a problem
+        self._any_fail = False
+
+        ## Status of the last check of each service (True if healthy)
+        self._status = {}
+
+        ## Cache hits/misses and HTTP statuses, wall-clock time per probe
+        self._metrics = collections.Counter()
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        """ Increment the counter `key` (thread-safe) """
+        with self._lock:
+            self._metrics[key] += 1
+
+    @property
+    def msg(self):
+        """ Message to be sent, assembled from the header and all reports """
+        return "".join(self._parts)
+
+    def _cache_file(self, service, arguments):
+        """
+        Return the file where the report of `service`, checked with
+        `arguments`, is cached.
+
+        Parameters
+        ----------
+        service : String
+            Name of the service (executors, jvms, yarn, spark, hdfs).
+        arguments : Dictionary
+            Arguments of the check, by name.
+
+        Returns
+        ----------
+        path : String
+            Path of the cache file, built from `cache_path`.
+
+        Examples
+        ----------
+        >>> bot = ClusterBot("", ["yarn"])
+        >>> bot.cache_path = "data/cache_{}.json"
+        >>> path = bot._cache_file("yarn", {"nslave_expected": 9})
+        >>> path.startswith("data/cache_yarn_")
+        True
+        >>> path == bot._cache_file("yarn", {"nslave_expected": 8})
+        False
+        """
+        key = json.dumps(arguments, sort_keys=True).encode()
+        return self.cache_path.format(
+            "{}_{}".format(service, hashlib.sha256(key).hexdigest()[:16]))
+
+    def _cache_get(self, service, arguments, ttl):
+        """
+        Return the cached report of `service`, checked with `arguments`, if
+        it is younger than `ttl` seconds, None otherwise. The report is
+        looked up in memory first, then on disk if missing or outdated in
+        memory (another process may have stored a fresher one). The status
+        of a cached report is recorded as if the check had run. The cache
+        is never used in test mode.
+
+        Parameters
+        ----------
+        service : String
+            Name of the service (executors, jvms, yarn, spark, hdfs).
+        arguments : Dictionary
+            Arguments of the check, by name.
+        ttl : Float
+            Lifetime of the cached report, in seconds.
+
+        Returns
+        ----------
+        msg : String or None
+            The cached report, or None if missing or outdated.
+
+        Examples
+        ----------
+        >>> bot = ClusterBot("", ["yarn"], test=True)
+        +-- RUNNING IN TEST MODE --+
+        >>> print(bot._cache_get("yarn", {}, 30))
+        None
+
+        Reports are cached for given arguments
+        >>> import glob, json, os, time
+        >>> bot = ClusterBot("", ["yarn"])
+        >>> bot.cache_path = "data/cache_get_{}.json"
+        >>> bot._cache_put("yarn", {"nslave_expected": 9}, "9/9 up\\n", True)
+        >>> print(bot._cache_get("yarn", {"nslave_expected": 9}, 30), end="")
+        9/9 up
+        >>> print(bot._cache_get("yarn", {"nslave_expected": 8}, 30))
+        None
+
+        and for a given cache path
+        >>> other = ClusterBot("", ["yarn"])
+        >>> other.cache_path = "data/cache_other_{}.json"
+        >>> print(other._cache_get("yarn", {"nslave_expected": 9}, 30))
+        None
+
+        A fresher report stored by another process is picked up
+        >>> path = bot._cache_file("yarn", {"nslave_expected": 9})
+        >>> ClusterBot._memo[path]["ts"] -= 60
+        >>> with open(path, "w") as f:
+        ...     json.dump(
+        ...         {"ts": time.time(), "msg": "8/9 up\\n", "ok": False}, f)
+        >>> print(bot._cache_get("yarn", {"nslave_expected": 9}, 30), end="")
+        8/9 up
+        >>> bot._any_fail
+        True
+        >>> for path in glob.glob("data/cache_get_*.json"):
+        ...     os.remove(path)
+        """
+        if self.test:
+            return None
+
+        path = self._cache_file(service, arguments)
+        now = time.time()
+        entry = self._memo.get(path)
+        ## Missing or outdated in memory: another process may have cached a
+        ## fresher report on disk
+        if entry is None or now - entry["ts"] > ttl:
+            try:
+                with open(path, "r") as f:
+                    entry = json.load(f)
+                entry = dict(
+                    ts=float(entry["ts"]), msg=entry["msg"], ok=entry["ok"])
+            except (OSError, ValueError, KeyError, TypeError):
+                entry = None
+
+        if entry is None or now - entry["ts"] > ttl:
+            self._count("cache.miss.{}".format(service))
+            return None
+
+        self._memo[path] = entry
+        self._count("cache.hit.{}".format(service))
+
+        if not entry["ok"]:
+            self._any_fail = True
+        return entry["msg"]
+
+    def _cache_put(self, service, arguments, msg, ok):
+        """
+        Store the report `msg` of `service`, checked with `arguments`, on
+        disk, together with its status and the current time. The cache
+        directory is created if needed, readable and writable by the
+        current user only. Nothing is stored in test mode.
+
+        Parameters
+        ----------
+        service : String
+            Name of the service (executors, jvms, yarn, spark, hdfs).
+        arguments : Dictionary
+            Arguments of the check, by name.
+        msg : String
+            Report of the service.
+        ok : Boolean
+            True if the service is healthy.
+
+        Examples
+        ----------
+        >>> import os, shutil
+        >>> bot = ClusterBot("", ["yarn"])
+        >>> bot.cache_path = "data/cache_put/{}.json"
+        >>> bot._cache_put("yarn", {}, "9/9 up\\n", True)
+        >>> oct(os.stat("data/cache_put").st_mode & 0o777)
+        '0o700'
+        >>> shutil.rmtree("data/cache_put")
+        """
+        if self.test:
+            return
+
+        path = self._cache_file(service, arguments)
+        entry = {"ts": time.time(), "msg": msg, "ok": ok}
+        self._memo[path] = entry
+        try:
+            os.makedirs(
+                os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(entry, f)
+        except OSError:
+            pass
+
+    def _report(self, service, msg, ok):
+        """
+        Record the outcome of the check of `service`: flag the run as
+        failed if needed, and keep the status for the cache.
+
+        Parameters
+        ----------
+        service : String
+            Name of the service (executors, jvms, yarn, spark, hdfs).
+        msg : String
+            Report of the service.
+        ok : Boolean
+            True if the service is healthy.
+
+        Returns
+        ----------
+        msg : String
+            The report, unchanged.
+        """
+        ## Only ever set, so concurrent checks cannot lose a failure
+        if not ok:
+            self._any_fail = True
+        self._status[service] = ok
+        return msg
 
     def run_all(self):
         """
-        Run the services. If a service is not registered by the user,
-        mention it as disabled.
+        Run the services concurrently. If a service is not registered by
+        the user, mention it as disabled.
 
         Examples
         ----------
@@ -79,41 +463,37 @@ class ClusterBot():
         >>> msg = bot.run_all()
 
         """
-        if "executors" in self.services:
-            self.msg += self.check_executors()
-        else:
-            self.msg += ":black_circle: Executor monitoring disabled\n"
-
-        if "jvms" in self.services:
-            self.msg += self.check_jvms()
-        else:
-            self.msg += ":black_circle: JVMs monitoring disabled\n"
-
-        if "yarn" in self.services:
-            self.msg += self.check_yarn()
-        else:
-            self.msg += ":black_circle: YARN monitoring disabled\n"
-
-        if "hdfs" in self.services:
-            self.msg += self.check_hdfs()
-        else:
-            self.msg += ":black_circle: HDFS monitoring disabled\n"
-
-        if "spark" in self.services:
-            self.msg += self.check_spark()
-        else:
-            self.msg += ":black_circle: Spark monitoring disabled\n"
-
-        if "red_circle" in self.msg:
+        self._any_fail = False
+
+        ## Checks are independent and wait on external commands:
+        ## run them concurrently, and assemble the reports in order.
+        enabled = [
+            (service, method) for service, method in self._SERVICES
+            if service in self._services]
+        with ThreadPoolExecutor(max_workers=max(1, len(enabled))) as ex:
+            futures = {
+                service: ex.submit(getattr(self, method))
+                for service, method in enabled}
+
+        for service, _ in self._SERVICES:
+            if service in futures:
+                self._parts.append(futures[service].result())
+            else:
+                self._parts.append(self._DISABLED[service])
+
+        if self._any_fail:
             self.username = "Problem(s) happened!"
         else:
             self.username = "Cluster alright!"
 
+    @_timed_check("yarn")
+    @_ttl_cached("yarn")
     def check_yarn(self, nslave_expected=9, logtest="data/yarn_test_OK.txt"):
         """
         List all nodes managed by YARN, and look at the status. A node is said
         OK if its status is RUNNING. All other keywords will be considered as
-        a failure (LOST, ...).
+        a failure (LOST, ...). Nodes are listed through the ResourceManager
+        REST API if `rm_url` is set, which avoids starting a JVM.
 
         Parameters
         ----------
@@ -141,19 +521,58 @@ class ClusterBot():
         :red_circle: YARN monitoring (8/9 slaves up)
         _run <yarn node -list -all> for more information_
         <BLANKLINE>
+
+        Through the ResourceManager REST API, next to a cached report of
+        another service
+        >>> import glob, os, sys
+        >>> libbot = sys.modules[ClusterBot.__module__]
+        >>> class FakeResponse():
+        ...     def raise_for_status(self):
+        ...         pass
+        ...     def json(self):
+        ...         return {"nodes": {"node": [{"state": "RUNNING"}] * 9}}
+        >>> class FakeSession():
+        ...     def get(self, url, timeout):
+        ...         return FakeResponse()
+        >>> get_session = libbot._get_session
+        >>> libbot._get_session = FakeSession
+        >>> bot = ClusterBot(
+        ...     "", ["yarn", "executors"], rm_url="http://master:8088")
+        >>> bot.cache_path = "data/cache_yarn_{}.json"
+        >>> arguments = {
+        ...     "nslave_expected": 9, "logtest": "data/executor_test_OK.txt"}
+        >>> bot._cache_put("executors", arguments,
+        ...     ":red_circle: Executors (8/9 slaves up)\\n", False)
+        >>> bot._any_fail = False
+
+        >>> print(bot.check_yarn())
+        :white_check_mark: YARN monitoring (9/9 slaves up)
+        <BLANKLINE>
+        >>> bot._any_fail
+        False
+        >>> print(bot.check_executors())
+        :red_circle: Executors (8/9 slaves up)
+        <BLANKLINE>
+        >>> sorted(bot._metrics.items())
+        [('cache.hit.executors', 1), ('cache.miss.yarn', 1)]
+        >>> sorted(bot._timings)
+        ['executors', 'yarn']
+
+        >>> libbot._get_session = get_session
+        >>> for path in glob.glob("data/cache_yarn_*.json"):
+        ...     os.remove(path)
         """
         if self.test:
-            cmd = None
-            logname = logtest
+            nslave = read_log(None, logtest).count(b"RUNNING")
+        elif self.rm_url is not None:
+            nslave = self._count_running_nodes()
         else:
             cmd = "yarn node -list -all"
-            logname = "yarn_{}".format(self.date.replace(" ", "_"))
-
-        yarn_log = return_log(cmd, logname)
-
-        nslave = len([line for line in yarn_log if "RUNNING" in line])
+            logname = "yarn_{}".format(self._safe_date)
+            nslave = read_log(cmd, logname).count(b"RUNNING")
 
-        if (nslave == nslave_expected):
+        ok = nslave == nslave_expected
+        if ok:
             msg = ":white_check_mark: YARN monitoring ({}/{} slaves up)\n".format(
                 nslave, nslave_expected)
         else:
@@ -161,13 +580,79 @@ class ClusterBot():
                 nslave, nslave_expected)
             msg += "_run <yarn node -list -all> for more information_\n"
 
-        return msg
+        return self._report("yarn", msg, ok)
+
+    def _count_running_nodes(self):
+        """
+        Count the RUNNING nodes reported by the YARN ResourceManager at
+        `rm_url`. An unreachable ResourceManager, or an unexpected answer,
+        counts as no node running.
 
+        Returns
+        ----------
+        nslave : Int
+            Number of nodes in the RUNNING state.
+
+        Examples
+        ----------
+        >>> import sys, requests
+        >>> libbot = sys.modules[ClusterBot.__module__]
+        >>> class FakeResponse():
+        ...     def __init__(self, payload):
+        ...         self.payload = payload
+        ...     def raise_for_status(self):
+        ...         pass
+        ...     def json(self):
+        ...         return self.payload
+        >>> class FakeSession():
+        ...     def __init__(self, answer):
+        ...         self.answer = answer
+        ...     def get(self, url, timeout):
+        ...         if isinstance(self.answer, Exception):
+        ...             raise self.answer
+        ...         return FakeResponse(self.answer)
+        >>> get_session = libbot._get_session
+        >>> bot = ClusterBot("", ["yarn"], rm_url="http://master:8088")
+
+        >>> nodes = [{"state": "RUNNING"}] * 8 + [{"state": "LOST"}]
+        >>> payload = {"nodes": {"node": nodes}}
+        >>> libbot._get_session = lambda: FakeSession(payload)
+        >>> bot._count_running_nodes()
+        8
+
+        No node registered
+        >>> libbot._get_session = lambda: FakeSession({"nodes": None})
+        >>> bot._count_running_nodes()
+        0
+
+        ResourceManager unreachable
+        >>> libbot._get_session = lambda: FakeSession(
+        ...     requests.ConnectionError("down"))
+        >>> bot._count_running_nodes()
+        0
+        >>> libbot._get_session = get_session
+        """
+        ## Deferred, see _make_session
+        import requests
+
+        url = "{}/ws/v1/cluster/nodes".format(self.rm_url.rstrip("/"))
+        try:
+            r = _get_session().get(url, timeout=5)
+            r.raise_for_status()
+            ## "nodes" is null when no node is registered
+            nodes = (r.json()["nodes"] or {}).get("node", [])
+            return sum(node["state"] == "RUNNING" for node in nodes)
+        except (requests.RequestException, ValueError, KeyError):
+            return 0
+
+    @_timed_check("executors")
+    @_ttl_cached("executors")
     def check_executors(
             self, nslave_expected=9, logtest="data/executor_test_OK.txt"):
         """
         List all nodes managed by your cluster, and look at the status.
         A node is said OK if we can send packets to network hosts (ping OK).
+        All nodes are pinged concurrently, with `fping` if available.
 
         Parameters
         ----------
@@ -196,29 +681,33 @@ class ClusterBot():
         _run <ping -c 1 slave#> for more information_
         <BLANKLINE>
         """
+        slaves = ["slave{}".format(i) for i in range(1, nslave_expected + 1)]
         if self.test:
-            cmd = None
-            logname = logtest
-        else:
-            cmd = "for i in $(seq 1 {});".format(nslave_expected)
-            cmd += "do ping -c 1 slave$i; done"
-            logname = "executors_{}".format(self.date.replace(" ", "_"))
-
-        executors_log = return_log(cmd, logname)
-        nslave = len([line for line in executors_log if "--- slave" in line])
-        nslaveok = len(
-            [line for line in executors_log if "transmitted" in line])
-
-        if (nslave == nslave_expected & nslave == nslaveok):
-            msg = ":white_check_mark: Executors ({}/{} slaves up)\n".format(
-                nslaveok, nslave_expected)
+            ## Fixtures are `ping` logs
+            executors_log = read_log(None, logtest)
+            nslave = executors_log.count(b"--- slave")
+            nslaveok = executors_log.count(b"transmitted")
+        elif shutil.which("fping") is not None:
+            ## All slaves are pinged at once, one summary line per slave
+            cmd = "fping -c1 -t500 " + " ".join(slaves)
+            logname = "executors_{}".format(self._safe_date)
+            with open_log(cmd, logname) as executors_log:
+                nslave, nslaveok = _count_fping(executors_log)
         else:
-            msg = ":red_circle: Executors ({}/{} slaves up)\n".format(
-                nslaveok, nslave_expected)
+            nslave = len(slaves)
+            nslaveok = sum(ping_slaves(slaves))
+
+        ok = nslave == nslave_expected and nslave == nslaveok
+        glyph = ":white_check_mark:" if ok else ":red_circle:"
+        msg = "{} Executors ({}/{} slaves up)\n".format(
+            glyph, nslaveok, nslave_expected)
+        if not ok:
             msg += "_run <ping -c 1 slave#> for more information_\n"
 
-        return msg
+        return self._report("executors", msg, ok)
 
+    @_timed_check("jvms")
+    @_ttl_cached("jvms")
     def check_jvms(self, nslave_expected=9, logtest="data/jvm_test_OK.txt"):
         """
         List all instrumented JVMs on your cluster, and look at the status.
@@ -250,33 +739,56 @@ class ClusterBot():
         :red_circle: inst. JVMs (8/9 slaves up)
         _run <ssh slave# jps -lm> for more information_
         <BLANKLINE>
+
+        A slave which cannot be probed (no output at all) is down
+        >>> import glob, os, sys
+        >>> libbot = sys.modules[ClusterBot.__module__]
+        >>> def fake_probe_slaves(nslave, logname):
+        ...     logs = [[b"1234 org.apache.spark.deploy.worker.Worker\\n"]] * 8
+        ...     return [
+        ...         ("--- {} ---\\n".format(i).encode(), log)
+        ...         for i, log in enumerate(logs + [[]], 1)]
+        >>> probe_slaves = libbot.probe_slaves
+        >>> libbot.probe_slaves = fake_probe_slaves
+        >>> bot = ClusterBot("", ["jvms"])
+        >>> bot.cache_path = "data/cache_jvms_{}.json"
+        >>> print(bot.check_jvms())
+        :red_circle: inst. JVMs (8/9 slaves up)
+        _run <ssh slave# jps -lm> for more information_
+        <BLANKLINE>
+        >>> libbot.probe_slaves = probe_slaves
+        >>> for path in glob.glob("data/cache_jvms_*.json"):
+        ...     os.remove(path)
         """
+        problem = nslaves = 0
         if self.test:
             cmd = None
             logname = logtest
             jvms_log = return_log(cmd, logname)
         else:
-            logname = "jvms_{}".format(self.date.replace(" ", "_"))
+            logname = "jvms_{}".format(self._safe_date)
             jvms_log = []
 
-            ## Loop over slaves
-            for i in range(1, nslave_expected + 1):
-                ## ID
-                cmd = "echo --- {} ---"
-                id = return_log(cmd.format(i), logname)[0]
+            ## Probe all slaves concurrently, keep the output ordered
+            for id, log in probe_slaves(nslave_expected, logname):
                 jvms_log.append(id)
-
-                ## Services using JVMs
-                cmd = "sudo -i ssh slave{} jps -lm"
-                log = return_log(cmd.format(i), logname)
-                [jvms_log.append(line) for line in log]
-
-        problem = len(
-            [line for line in jvms_log if "unavailable" in line])
-        nslaves = len(
-            [line for line in jvms_log if "--- " in line])
-
-        if (problem == 0):
+                jvms_log.extend(log)
+
+                ## No output at all: the probe could not even be launched
+                if not log:
+                    problem += 1
+
+        for line in jvms_log:
+            m = _JVMS_RE.search(line)
+            if m is None:
+                continue
+            if m.lastindex == 1:
+                problem += 1
+            else:
+                nslaves += 1
+
+        ok = problem == 0
+        if ok:
             msg = ":white_check_mark: inst. JVMs ({}/{} slaves up)\n".format(
                 nslaves, nslave_expected)
         else:
@@ -284,8 +796,10 @@ class ClusterBot():
                 nslaves - problem, nslave_expected)
             msg += "_run <ssh slave# jps -lm> for more information_\n"
 
-        return msg
+        return self._report("jvms", msg, ok)
 
+    @_timed_check("spark")
+    @_ttl_cached("spark")
     def check_spark(self, nslave_expected=9, logtest="data/spark_test_OK.txt"):
         """
         Check if all Spark workers are up.
@@ -322,36 +836,35 @@ class ClusterBot():
             logname = logtest
             spark_log = return_log(cmd, logname)
         else:
-            logname = "spark_{}".format(self.date.replace(" ", "_"))
+            logname = "spark_{}".format(self._safe_date)
             spark_log = []
 
-            ## Loop over slaves
-            for i in range(1, nslave_expected + 1):
-                ## ID
-                cmd = "echo --- {} ---"
-                id = return_log(cmd.format(i), logname)[0]
+            ## Probe all slaves concurrently, keep the output ordered
+            for id, log in probe_slaves(nslave_expected, logname):
                 spark_log.append(id)
-
-                ## Services using JVMs
-                cmd = "sudo -i ssh slave{} jps -lm"
-                log = return_log(cmd.format(i), logname)
-                [spark_log.append(line) for line in log]
-
-        workers = len(
-            [line for line in spark_log if "spark://vm-75222" in line])
-        nslaves = len(
-            [line for line in spark_log if "--- " in line])
-
-        if (workers == nslaves & workers == nslave_expected):
-            msg = ":white_check_mark: Spark ({}/{} slaves up)\n".format(
-                nslaves, nslave_expected)
-        else:
-            msg = ":red_circle: Spark ({}/{} slaves up)\n".format(
-                workers, nslave_expected)
+                spark_log.extend(log)
+
+        workers = nslaves = 0
+        for line in spark_log:
+            m = _SPARK_RE.search(line)
+            if m is None:
+                continue
+            if m.lastindex == 1:
+                workers += 1
+            else:
+                nslaves += 1
+
+        ok = workers == nslaves and workers == nslave_expected
+        glyph = ":white_check_mark:" if ok else ":red_circle:"
+        msg = "{} Spark ({}/{} slaves up)\n".format(
+            glyph, workers, nslave_expected)
+        if not ok:
             msg += "_run <ssh slave# jps -lm | grep spark> for more information_\n"
 
-        return msg
+        return self._report("spark", msg, ok)
 
+    @_timed_check("hdfs")
+    @_ttl_cached("hdfs")
     def check_hdfs(self, nnode_expected=9, logtest="data/hdfs_test_OK.txt"):
         """
         Check whether all DataNotes are alive on your cluster,
@@ -383,29 +896,48 @@ class ClusterBot():
         :red_circle: HDFS (8/9 DataNodes up)
         _run <su -c 'hdfs dfsadmin -report' - hduser> for more information_
         <BLANKLINE>
+
+        No report at all (e.g. hdfs could not be run)
+        >>> import os
+        >>> open("data/myLog.txt", "w").close()
+        >>> msg = bot.check_hdfs(logtest="data/myLog.txt")
+        >>> print(msg)
+        :red_circle: HDFS (0/9 DataNodes up)
+        _run <su -c 'hdfs dfsadmin -report' - hduser> for more information_
+        <BLANKLINE>
+        >>> os.remove("data/myLog.txt")
         """
         if self.test:
             cmd = None
             logname = logtest
-            hdfs_log = return_log(cmd, logname)
         else:
-            logname = "hdfs_{}".format(self.date.replace(" ", "_"))
+            logname = "hdfs_{}".format(self._safe_date)
             cmd = "sudo -i su -c 'hdfs dfsadmin -report' - hduser"
-            hdfs_log = return_log(cmd, logname)
 
-        problem = len(
-            [line for line in hdfs_log if "Dead" in line])
-        live_tmp = [line for line in hdfs_log if "Live datanodes" in line][0]
-        live = [int(c) for c in live_tmp if c.isnumeric()][0]
-
-        if (problem == 0):
+        ## No "Live datanodes" line means the report could not be produced
+        problem = 0
+        live = None
+        with open_log(cmd, logname) as hdfs_log:
+            for line in hdfs_log:
+                m = _HDFS_RE.search(line)
+                if m is None:
+                    continue
+                if m.lastindex == 1:
+                    problem += 1
+                else:
+                    live = int(m.group(2))
+
+        ok = problem == 0 and live is not None
+        if live is None:
+            live = 0
+        if ok:
             msg = ":white_check_mark: HDFS ({}/{} DataNodes up)\n".format(
                 live, nnode_expected)
         else:
             msg = ":red_circle: HDFS ({}/{} DataNodes up)\n".format(
                 live, nnode_expected)
             msg += "_run <su -c 'hdfs dfsadmin -report' - hduser> for more information_\n"
-        return msg
+        return self._report("hdfs", msg, ok)
 
     def send_data(self):
         """
@@ -414,6 +946,12 @@ class ClusterBot():
         In addition, all commands run will be summarized with individual
         results (success/failure).
 
+        Reports are queued in an outbox on disk and posted together in a
+        single message (see `flush`) when the status changes, when the
+        oldest queued report is `batch_age` seconds old, or when
+        `batch_size` reports are queued. A report identical to the previous
+        one (header excluded) is not queued again.
+
         In test mode, no data is sent, and the message is
         printed out on the screen.
 
@@ -432,72 +970,528 @@ class ClusterBot():
         :black_circle: HDFS monitoring disabled
         :black_circle: Spark monitoring disabled
         <BLANKLINE>
+
+        An alert which fails to be posted is posted on the next run
+        >>> import glob, os, sys, json, time, requests
+        >>> libbot = sys.modules[ClusterBot.__module__]
+        >>> class FakeResponse():
+        ...     def __init__(self, status_code):
+        ...         self.status_code = status_code
+        ...         self.ok = status_code < 400
+        ...     def raise_for_status(self):
+        ...         pass
+        ...     def json(self):
+        ...         return {"nodes": {"node": [{"state": "RUNNING"}] * 8}}
+        >>> class FakeSession():
+        ...     status_code = None
+        ...     posts = 0
+        ...     def get(self, url, timeout):
+        ...         return FakeResponse(200)
+        ...     def post(self, url, json, timeout):
+        ...         FakeSession.posts += 1
+        ...         if FakeSession.status_code is None:
+        ...             raise requests.ConnectionError("refused")
+        ...         return FakeResponse(FakeSession.status_code)
+        >>> get_session = libbot._get_session
+        >>> libbot._get_session = FakeSession
+        >>> def tick():
+        ...     bot = ClusterBot("", ["yarn"], rm_url="http://master:8088")
+        ...     bot.cache_path = "data/cache_send_{}.json"
+        ...     bot.outbox_path = "data/outbox.json"
+        ...     bot.metrics_path = "data/metrics.json"
+        ...     bot.run_all()
+        ...     bot.send_data()
+        ...     with open(bot.outbox_path) as f:
+        ...         outbox = json.load(f)
+        ...     return FakeSession.posts, outbox["status"], len(outbox["reports"])
+        >>> with open("data/outbox.json", "w") as f:
+        ...     json.dump(
+        ...         {"digest": None, "status": "Cluster alright!", "reports": []},
+        ...         f)
+
+        >>> tick()
+        (1, 'Cluster alright!', 1)
+        >>> FakeSession.status_code = 500
+        >>> tick()
+        (2, 'Cluster alright!', 1)
+        >>> FakeSession.status_code = 200
+        >>> tick()
+        (3, 'Problem(s) happened!', 0)
+
+        Reports with an unchanged status are posted once `batch_size` of
+        them are queued, or once the oldest one is `batch_age` seconds old
+        >>> def queue(report, failed, **kwargs):
+        ...     bot = ClusterBot("", [], **kwargs)
+        ...     bot.outbox_path = "data/outbox.json"
+        ...     bot.metrics_path = "data/metrics.json"
+        ...     bot._parts.append(report)
+        ...     bot._any_fail = failed
+        ...     bot.username = "Problem(s) happened!"
+        ...     bot.send_data()
+        ...     with open(bot.outbox_path) as f:
+        ...         return FakeSession.posts, len(json.load(f)["reports"])
+        >>> FakeSession.posts = 0
+
+        >>> queue("YARN (7/9 slaves up)\\n", True, batch_size=2)
+        (0, 1)
+        >>> queue("YARN (6/9 slaves up)\\n", True, batch_size=2)
+        (1, 0)
+
+        >>> with open("data/outbox.json", "w") as f:
+        ...     json.dump({
+        ...         "digest": None, "status": "Problem(s) happened!",
+        ...         "reports": [[time.time() - 1000, "old\\n", True]]}, f)
+        >>> queue("YARN (5/9 slaves up)\\n", True, batch_age=2000)
+        (1, 2)
+        >>> queue("YARN (4/9 slaves up)\\n", True, batch_age=900)
+        (2, 0)
+
+        >>> libbot._get_session = get_session
+        >>> for path in glob.glob("data/cache_send_*.json") + [
+        ...         "data/outbox.json", "data/metrics.json"]:
+        ...     os.remove(path)
         """
         if self.test:
             print(self.msg)
+            return
+
+        outbox = self._load_outbox()
+
+        ## Do not queue a report identical to the previous one
+        report = "".join(self._parts[1:])
+        digest = hashlib.sha256(report.encode()).hexdigest()
+        if digest != outbox["digest"]:
+            outbox["reports"].append(
+                [time.time(), self.msg, self._any_fail])
+            outbox["digest"] = digest
+
+        reports = outbox["reports"]
+        flush = len(reports) > 0 and (
+            outbox["status"] != self.username or
+            time.time() - reports[0][0] > self.batch_age or
+            len(reports) >= self.batch_size)
+
+        ## Keep the previous status until the reports are posted, so that
+        ## a failed post is retried on the next run
+        if not flush:
+            outbox["status"] = self.username
+        elif self.flush(reports):
+            outbox["reports"] = []
+            outbox["status"] = self.username
+
+        self._save_outbox(outbox)
+        self._save_metrics()
+
+    def flush(self, reports):
+        """
+        Post queued reports to the server in a single message. When
+        several reports are sent, each one is preceded by a separator
+        with the time it was produced. The username reflects the worst
+        status among the reports.
+
+        Parameters
+        ----------
+        reports : List of (Float, String, Boolean)
+            Queued reports, as (timestamp, message, failed) triplets.
+
+        Returns
+        ----------
+        ok : Boolean
+            True if the server accepted the message, False if it rejected it
+            or could not be reached.
+
+        Examples
+        ----------
+        >>> import sys, time
+        >>> libbot = sys.modules[ClusterBot.__module__]
+        >>> class FakeResponse():
+        ...     status_code = 200
+        ...     ok = True
+        >>> class FakeSession():
+        ...     def post(self, url, json, timeout):
+        ...         FakeSession.posted = json
+        ...         return FakeResponse()
+        >>> get_session = libbot._get_session
+        >>> libbot._get_session = FakeSession
+        >>> bot = ClusterBot("", ["yarn"])
+
+        A single report is posted as is
+        >>> bot.flush([[0, "report\\n", False]])
+        True
+        >>> FakeSession.posted
+        {'text': 'report\\n', 'username': 'Cluster alright!'}
+
+        Several reports are posted with their time, under the worst status
+        >>> bot.flush([[0, "first\\n", True], [60, "second\\n", False]])
+        True
+        >>> FakeSession.posted["username"]
+        'Problem(s) happened!'
+        >>> text = FakeSession.posted["text"]
+        >>> text = text.replace(time.ctime(0), "T0")
+        >>> print(text.replace(time.ctime(60), "T1"), end="")
+        --- tick @ T0 ---
+        first
+        --- tick @ T1 ---
+        second
+
+        >>> libbot._get_session = get_session
+        """
+        ## Deferred, see _make_session
+        import requests
+
+        if len(reports) == 1:
+            text = reports[0][1]
         else:
-            requests.post(
-                self.webhook_url,
-                json={"text": self.msg, "username": self.username},
-                headers={'Content-Type': 'application/json'})
+            text = "".join(
+                "--- tick @ {} ---\n{}".format(time.ctime(ts), msg)
+                for ts, msg, _ in reports)
 
+        if any(failed for _, _, failed in reports):
+            username = "Problem(s) happened!"
+        else:
+            username = "Cluster alright!"
+
+        try:
+            with _timed(self, "post"):
+                r = _get_session().post(
+                    self.webhook_url,
+                    json={"text": text, "username": username},
+                    timeout=5)
+        except requests.RequestException:
+            self._count("post.error")
+            return False
+        self._count("post.status.{}".format(r.status_code))
+        return r.ok
+
+    def _save_metrics(self):
+        """
+        Write the counters and timings of the run on disk, to keep an eye
+        on cache efficiency and probe latencies.
+        """
+        try:
+            with open(self.metrics_path, "w") as f:
+                json.dump({
+                    "ts": time.time(),
+                    "counters": self._metrics,
+                    "timings": self._timings}, f)
+        except OSError:
+            pass
+
+    def _load_outbox(self):
+        """
+        Load the outbox from disk. A missing or corrupted outbox is
+        replaced by an empty one.
 
-def return_log(cmd, logname, clean_log=True):
+        Returns
+        ----------
+        outbox : Dictionary
+            Digest and status of the last report, and queued reports.
+        """
+        try:
+            with open(self.outbox_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError, KeyError):
+            return {"digest": None, "status": None, "reports": []}
+
+    def _save_outbox(self, outbox):
+        """
+        Write the outbox on disk.
+
+        Parameters
+        ----------
+        outbox : Dictionary
+            Digest and status of the last report, and queued reports.
+        """
+        try:
+            with open(self.outbox_path, "w") as f:
+                json.dump(outbox, f)
+        except OSError:
+            pass
+
+
+def return_log_iter(cmd, logname, clean_log=True):
     """
-    Run a command `cmd`, redirect the output in `logname`, and return formatted
-    log. The data is written line-by-line. By default, the log is
-    removed from disk after the operation.
+    Run a command `cmd`, and yield its output (stdout and stderr)
+    line-by-line as it is produced, without holding the whole log in
+    memory. By default, nothing is written on disk. If `cmd` is None
+    (test mode), the log is read from `logname` instead.
+
+    The command is split with `shlex` and run directly, without an
+    intermediate shell: shell syntax (pipes, redirections, loops, ...) is
+    not supported. A command which cannot be launched yields nothing.
 
     Parameters
     ----------
     cmd : String
         Command to launch on the cluster.
     logname : String
-        Name of the (temporary) log to be written on the disk.
+        Name of the log. Read in test mode, written if `clean_log` is False.
     clean_log : Boolean, optional
-        If True, remove the log after the operation. Default is True.
+        If False, keep a copy of the log on disk under `logname`.
+        Default is True.
+
+    Yields
+    ----------
+    line : Bytes
+        The log produced by the command, line-by-line. Lines are not
+        decoded: markers are looked for as bytes.
+
+    Examples
+    ----------
+    >>> for line in return_log_iter("echo 'toto titi'", "data/myLog.txt"):
+    ...     print(line.decode(), end="")
+    toto titi
+
+    >>> list(return_log_iter("not_a_command", "data/myLog.txt"))
+    []
+    """
+    ## Test mode: stream the log from the disk, mapped in memory
+    if cmd is None:
+        with open(logname, "rb") as f:
+            ## Empty files cannot be mapped
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for line in iter(mm.readline, b""):
+                    yield line
+        return
+
+    ## Launch the command and stream its output
+    try:
+        proc = subprocess.Popen(
+            shlex.split(cmd), stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT)
+    except OSError:
+        return
+
+    ## Keep a copy of the log on the disk
+    keep = None if clean_log else open(logname, "ab")
+    try:
+        for line in proc.stdout:
+            if keep is not None:
+                keep.write(line)
+            yield line
+    finally:
+        proc.stdout.close()
+        proc.wait()
+        if keep is not None:
+            keep.close()
+
+
+def open_log(cmd, logname, clean_log=True):
+    """
+    Context manager around `return_log_iter`: the command is reaped, and
+    the files are closed, when leaving the block even if the log was not
+    read until the end. See `return_log_iter` for the parameters.
+
+    Examples
+    ----------
+    >>> with open_log("echo toto", "data/myLog.txt") as log:
+    ...     print(sum(b"toto" in line for line in log))
+    1
+    """
+    return contextlib.closing(return_log_iter(cmd, logname, clean_log))
+
+
+def read_log(cmd, logname, clean_log=True):
+    """
+    Run a command `cmd`, and return its whole output (stdout and stderr)
+    in a single buffer. Counting a marker is then a single `bytes.count`
+    over the buffer, with no per-line work. See `return_log_iter` for the
+    parameters.
+
+    Returns
+    ----------
+    data : Bytes
+        The log produced by the command.
+
+    Examples
+    ----------
+    >>> read_log("echo 'toto toto'", "data/myLog.txt").count(b"toto")
+    2
+
+    >>> read_log("not_a_command", "data/myLog.txt")
+    b''
+    """
+    ## Test mode: load the log from the disk
+    if cmd is None:
+        with open(logname, "rb") as f:
+            return f.read()
+
+    try:
+        data = subprocess.run(
+            shlex.split(cmd), stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT).stdout
+    except OSError:
+        return b""
+
+    ## Keep a copy of the log on the disk
+    if not clean_log:
+        with open(logname, "ab") as f:
+            f.write(data)
+
+    return data
+
+
+def return_log(cmd, logname, clean_log=True):
+    """
+    Run a command `cmd`, and return its output (stdout and stderr)
+    line-by-line. See `return_log_iter` for the parameters.
 
     Returns
     ----------
-    data : List of String
+    data : List of Bytes
         The log produced by the command, line-by-line.
 
     Examples
     ----------
     Keep the log on disk
     >>> log = return_log("echo toto", "data/myLog.txt", False)
-    >>> assert "toto" in log[0]
+    >>> assert b"toto" in log[0]
+    >>> import os
+    >>> os.remove("data/myLog.txt")
 
-    Clean the log after
+    Nothing written on disk
     >>> log = return_log("echo toto", "data/myLog.txt", True)
+    >>> assert b"toto" in log[0]
     >>> import glob
     >>> assert "data/myLog.txt" not in glob.glob("data/*.txt")
 
     """
-    ## Launch the command and redirect the log
-    if cmd is not None:
-        os.system(cmd + " >> {}".format(logname))
-        test = False
-    else:
-        test = True
-
-    ## Load the log in a list (line-by-line)
-    data = []
-    with open(logname, "r") as f:
-        for line in f:
-            data.append(line)
-
-    ## Remove log from the disk
-    if clean_log and not test:
-        os.system("rm {}".format(logname))
-
-    ## Return the data
-    return data
+    return list(return_log_iter(cmd, logname, clean_log))
+
+
+def _probe_slave(i, logname):
+    """
+    List the services using JVMs on slave `i`.
+
+    Parameters
+    ----------
+    i : Int
+        Index of the slave.
+    logname : String
+        Name of the log, see `return_log`.
+
+    Returns
+    ----------
+    out : Tuple of (Bytes, List of Bytes)
+        The slave ID line, and the log of `jps -lm` line-by-line.
+    """
+    cmd = "sudo -i ssh slave{} jps -lm".format(i)
+    return "--- {} ---\n".format(i).encode(), return_log(cmd, logname)
+
+
+def probe_slaves(nslave, logname):
+    """
+    Run `_probe_slave` on all slaves concurrently. Each probe is dominated
+    by the ssh round-trip, so the total wall time is bounded by the slowest
+    slave instead of the sum over slaves.
+
+    Parameters
+    ----------
+    nslave : Int
+        Number of slaves to probe (slave1, ..., slave`nslave`).
+    logname : String
+        Name of the log, see `return_log`.
+
+    Returns
+    ----------
+    out : List of Tuple
+        Output of `_probe_slave` for each slave, ordered by slave index.
+
+    Examples
+    ----------
+    >>> probe_slaves(0, "data/myLog.txt")
+    []
+    """
+    if nslave < 1:
+        return []
+    with ThreadPoolExecutor(max_workers=nslave) as ex:
+        return list(ex.map(
+            _probe_slave, range(1, nslave + 1), itertools.repeat(logname)))
+
+
+def ping_slaves(slaves):
+    """
+    Send one ICMP echo request to each slave, waiting at most one second
+    for each answer. All `ping` processes are spawned at once and then
+    reaped, so that unreachable slaves cost one timeout in total and not
+    one each.
+
+    Parameters
+    ----------
+    slaves : List of String
+        Names of the slaves to ping.
+
+    Returns
+    ----------
+    out : List of Boolean
+        True for each slave which answered, in the order of `slaves`.
+
+    Examples
+    ----------
+    >>> ping_slaves([])
+    []
+    """
+    procs = []
+    try:
+        for host in slaves:
+            procs.append(subprocess.Popen(
+                ["ping", "-c", "1", "-W", "1", host],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    except OSError:
+        ## ping not installed: nothing answers
+        for proc in procs:
+            proc.wait()
+        return [False] * len(slaves)
+
+    return [proc.wait() == 0 for proc in procs]
+
+
+def _count_fping(log):
+    """
+    Count the slaves reported in the output of `fping -c`, and those which
+    answered. A slave which could not be pinged at all (e.g. unknown host)
+    has no summary line, and is not counted.
+
+    Parameters
+    ----------
+    log : Iterable of Bytes
+        The output (stdout and stderr) of `fping -c`, line-by-line.
+
+    Returns
+    ----------
+    out : Tuple of Int
+        Number of slaves reported, and number of slaves which answered.
+
+    Examples
+    ----------
+    A slave which answered
+    >>> _count_fping([
+    ...     b"slave1 : [0], 64 bytes, 0.21 ms (0.21 avg, 0% loss)\\n",
+    ...     b"slave1 : xmt/rcv/%loss = 1/1/0%, min/avg/max = 0.2/0.2/0.2\\n"])
+    (1, 1)
+
+    A slave which did not answer
+    >>> _count_fping([b"slave2 : xmt/rcv/%loss = 1/0/100%\\n"])
+    (1, 0)
+
+    A slave which could not be pinged
+    >>> _count_fping([b"slave3: Name or service not known\\n"])
+    (0, 0)
+    """
+    nslave = nslaveok = 0
+    for line in log:
+        m = _FPING_RE.search(line)
+        if m is None:
+            continue
+        nslave += 1
+        if int(m.group(1)) > 0:
+            nslaveok += 1
+    return nslave, nslaveok
 
 
 if __name__ == "__main__":
     ## Run the test suite
     import doctest
-    if np.__version__ >= "1.14.0":
-        np.set_printoptions(legacy="1.13")
     doctest.testmod()